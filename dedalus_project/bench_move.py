@@ -0,0 +1,60 @@
+"""Compare sort.move with shutil.move for moves across file systems.
+
+Example: python bench_move.py /dev/shm /tmp/bench --size 256 --runs 5
+Runs alternate between the two functions so disk writeback affects both alike.
+"""
+import argparse, os, shutil, statistics, time
+from pathlib import Path
+from sort import move
+
+
+def make_file(path: Path, size_mib: int) -> None:
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mib):
+            f.write(block)
+
+
+def timed_move(func, src: Path, dst: Path, sync: bool) -> float:
+    start = time.perf_counter()
+    func(src, dst)
+    if sync:
+        os.sync()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark moving a file between two directories.")
+    parser.add_argument("src_dir", type=Path, help="source directory, e.g. on tmpfs")
+    parser.add_argument("dst_dir", type=Path, help="target directory on another file system")
+    parser.add_argument("--size", type=int, default=256, help="file size in MiB (default: 256)")
+    parser.add_argument("--runs", type=int, default=5, help="runs per function (default: 5)")
+    parser.add_argument("--sync", action="store_true", help="include os.sync() in every measurement")
+    args = parser.parse_args()
+
+    args.dst_dir.mkdir(parents=True, exist_ok=True)
+    if os.stat(args.src_dir).st_dev == os.stat(args.dst_dir).st_dev:
+        print("/// Warning: both directories are on the same file system, moves are plain renames.")
+
+    src = args.src_dir.joinpath("bench_move.bin")
+    dst = args.dst_dir.joinpath("bench_move.bin")
+    functions = {"sort.move": move, "shutil.move": shutil.move}
+    times = {name: [] for name in functions}
+    try:
+        for _ in range(args.runs):
+            for name, func in functions.items():
+                make_file(src, args.size)
+                os.sync()
+                times[name].append(timed_move(func, src, dst, args.sync))
+                dst.unlink()
+    finally:
+        src.unlink(missing_ok=True)
+        dst.unlink(missing_ok=True)
+
+    for name, values in times.items():
+        print(f"/// {name}: median {statistics.median(values):.3f} s, "
+              f"min {min(values):.3f} s, max {max(values):.3f} s ({args.size} MiB, {args.runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
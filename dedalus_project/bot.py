@@ -1,15 +1,23 @@
-import difflib, datetime, requests, subprocess, os, sys
-from classes import AddressBook, Name, Phone, Birthday, Email, Record
+import argparse, asyncio, difflib, datetime, json, requests, subprocess, os, sys
+from classes import AddressBook, Name, Phone, Birthday, Email, Record, Failure, normalize_phone
 from datetime import datetime
 from notebook import Notebook
+from server import DedalusServer, client_session
+from jobs import JobRunner
+from completion import install_completer
+import dedupe
+from stats import ContactStats
 
 bot_ver = 'Dedalus v1.2.3'
 
 API_KEY = "653c3ccd328356a16a58c6dbd440c093"
 
-address_book = AddressBook()
+address_book = AddressBook(unique_phones=True, unique_emails=True)
 notebook = Notebook()
 save_path = "notebook_data.pickle"
+job_runner = JobRunner()
+local_session = {}
+contact_stats = None
 
 
 def input_error(func):
@@ -17,11 +25,11 @@ def input_error(func):
         try:
             return func(*args)
         except KeyError:
-            return "/// Contact not found."
+            return Failure("/// Contact not found.")
         except ValueError:
-            return "/// Invalid input. Provide valid information."
+            return Failure("/// Invalid input. Provide valid information.")
         except IndexError:
-            return "/// Invalid command. Type \"help\" to show all commands."
+            return Failure("/// Invalid command. Type \"help\" to show all commands.")
     return wrapper
 
 
@@ -31,9 +39,15 @@ help_info = """/// Commands:
 /// "changebirthdate [name] [new_date]" - Change the birthdate for a contact. Example: changebirthdate John Doe 10.08.1990
 /// "changeemail [name] [new_email]" - Change the email for a contact. Example: changeemail John Doe john@example.com
 /// "changename [name] [new_name]" or "rename [name] [new_name]" - Change the name of a contact. Example: changename John Bill
+/// "owner [phone or email]" - Show the contact that owns a phone number or email. Example: owner +1234567890
 /// "upcomingbirthdays [number of days]" - Show upcoming birthdays. Example: upcomingbirthdays 7
+/// "stats contacts" - Show statistics: birthdays per month and weekday, ages, phone country codes, email domains.
+/// "dedupe [min_score]" - Find likely duplicate contacts. Min score is optional (0-1, default 0.6). Example: dedupe 0.8
+/// "dedupe merge all" or "dedupe merge [numbers]" - Merge found duplicates. Example: dedupe merge 1 3
 /// "delete [name]" - Delete a contact from the address book. Example: delete John Doe
 /// "search [query]" or "find [query]" - Search for contacts by name or phone number. Example: search John
+/// "search +[digits]" or "search [digits]*" - Search for phone numbers starting with digits. Example: search +380
+/// "search *[digits]" - Search for phone numbers ending with digits. Example: search *4567
 /// "showcontacts all" - Show all contacts. Example: showcontacts all
 /// "showcontacts [page_number]" - Show contacts page by page. Enter 'all' to show all contacts at once. Example: showcontacts 2
 /// "addnote [title] [content]" - Add a note.
@@ -42,8 +56,13 @@ help_info = """/// Commands:
 /// "editnote [title] [new_content]" - Editting note with given title.
 /// "deletenote [title]" - Delliting note with given title.
 /// "sort [path]" - Sort contacts and notes alphabetically. Example: sort D:\Folder
-/// "weather [city]" - Get the current weather. Example: weather New York
+/// "sort --watch [path]" - Keep sorting new files in the folder. Stop with Ctrl+C, or with "cancel [id]" when run with "&". Example: sort --watch D:\Downloads &
+/// "weather [city]" - Get the current weather. Runs in background. Example: weather New York
 /// "time" - Get the current time.
+/// "[command] &" - Run sort, weather or time in background. Example: sort D:\Folder &
+/// "jobs" - Show background jobs.
+/// "wait [id]" - Wait for a background job and show its result. Example: wait 1
+/// "cancel [id]" - Cancel a queued background job or stop a running sort. Example: cancel 1
 /// "help" - Show this help message.
 /// "short" - List of short versions of all commands.
 /// "exit", "bye", "good bye", "close", "quit" - Turn off the assistant."""
@@ -54,9 +73,13 @@ short_commands = """/// Commands:
 /// "cb [name] [new_date]" - Change birthdate. Example: cb John Doe 10.08.1990
 /// "ce [name] [new_email]" - Change email. Example: ce John Doe john@example.com
 /// "cn [name] [new_name]" - Change name. Example: cn John Doe John Smith
+/// "ow [phone or email]" - Show the owner of a phone or email. Example: ow john@example.com
 /// "ub [number of days]" - Show upcoming birthdays. Example: ub 7
+/// "st contacts" - Show contact statistics.
+/// "dd [min_score]" - Find duplicate contacts. Example: dd 0.8
+/// "dd merge all" or "dd merge [numbers]" - Merge found duplicates. Example: dd merge 1 3
 /// "d [name]" - Delete a contact. Example: d John Doe
-/// "f [query]" - Search for contacts. Example: f John
+/// "f [query]" - Search for contacts. Example: f John, f +380, f *4567
 /// "sc all" - Show all contacts. Example: sc all
 /// "sc [page_number]" - Show contacts page by page. Enter 'all' to show all contacts at once. Example: sc 2
 /// "an [title] [content] [tag]" - Add a note.
@@ -67,6 +90,10 @@ short_commands = """/// Commands:
 /// "s [path]" - Sort contacts and notes alphabetically. Example: s D:\Folder
 /// "w [city]" - Get the current weather. Example: w New York
 /// "t" - Get the current time.
+/// "[command] &" - Run sort, weather or time in background. Example: s D:\Folder &
+/// "jobs" - Show background jobs.
+/// "wait [id]" - Wait for a background job. Example: wait 1
+/// "cancel [id]" - Cancel a queued job or stop a running sort. Example: cancel 1
 /// "h" - Show help message.
 /// "q" - Turn off the assistant."""
 
@@ -88,7 +115,7 @@ def short_commands_handler(*args):
 @input_error
 def add_handler(*args):
     if len(args) < 2:
-        return "/// Invalid command. Please provide name and phone."
+        return Failure("/// Invalid command. Please provide name and phone.")
 
     name = str(Name(args[0]))
     phone = str(args[1])
@@ -109,8 +136,8 @@ def add_handler(*args):
 
     rec: Record = address_book.get(name)
     if rec:
-        if any(str(phone) == existing_phone.value for existing_phone in rec.phones):
-            return f"/// Phone number {phone} already exists for contact: {name}."
+        if any(normalize_phone(phone) == normalize_phone(existing_phone.value) for existing_phone in rec.phones):
+            return Failure(f"/// Phone number {phone} already exists for contact: {name}.")
         return rec.add_phone(phone)
 
     address_book.add_record(name, phone, birthday, email)
@@ -124,7 +151,7 @@ def add_handler(*args):
 @input_error
 def change_phone_handler(*args):
     if len(args) < 3:
-        return "/// Invalid command. Please provide name, old phone, and new phone."
+        return Failure("/// Invalid command. Please provide name, old phone, and new phone.")
 
     name = args[0]
     old_phone = args[1]
@@ -136,15 +163,15 @@ def change_phone_handler(*args):
             rec.change_phone(old_phone, new_phone)
             return f"/// Phone number changed from {old_phone} to {new_phone} for contact: {name}"
         else:
-            return f"/// Phone number {old_phone} not found for contact: {name}"
+            return Failure(f"/// Phone number {old_phone} not found for contact: {name}")
     else:
-        return f"/// No contacts with name: \"{name}\" in the address book"
+        return Failure(f"/// No contacts with name: \"{name}\" in the address book")
 
 
 @input_error
 def change_birthdate_handler(*args):
     if len(args) < 2:
-        return "/// Invalid command. Please provide name and new birthdate (in the format 'dd.mm.yyyy')."
+        return Failure("/// Invalid command. Please provide name and new birthdate (in the format 'dd.mm.yyyy').")
 
     name = args[0]
     new_birthday = Birthday(datetime.strptime(args[1], "%d.%m.%Y").date())
@@ -154,61 +181,67 @@ def change_birthdate_handler(*args):
         rec.birthday = new_birthday
         return f"/// Birthdate changed to {new_birthday} for contact: {name}"
     else:
-        return f"/// No contacts with name: \"{name}\" in the address book"
+        return Failure(f"/// No contacts with name: \"{name}\" in the address book")
     
 @input_error
 def change_email_handler(*args):
     if len(args) < 2:
-        return "/// Invalid command. Please provide name and new email."
+        return Failure("/// Invalid command. Please provide name and new email.")
 
     name = args[0]
     new_email = args[1]
 
     rec: Record = address_book.get(name)
     if rec:
-        rec.email = new_email
+        rec.email = Email(new_email)
         return f"/// Email changed to {new_email} for contact: {name}"
     else:
-        return f"/// No contacts with name: \"{name}\" in the address book"
+        return Failure(f"/// No contacts with name: \"{name}\" in the address book")
     
 @input_error
 def change_name_handler(*args):
     if len(args) < 2:
-        return "/// Invalid command. Please provide name and new name."
+        return Failure("/// Invalid command. Please provide name and new name.")
 
     old_name = args[0]
     new_name = args[1]
 
-    rec: Record = address_book.get(old_name)
-    if rec:
-        rec.name.value = new_name
-        return f"/// Name changed \"{old_name}\" ---> \"{new_name}\"."
+    if old_name in address_book:
+        rec: Record = address_book.rename(old_name, new_name)
+        return f"/// Name changed \"{old_name}\" ---> \"{rec.name}\"."
     else:
-        return f"/// No contacts with name: \"{old_name}\" in the address book"
+        return Failure(f"/// No contacts with name: \"{old_name}\" in the address book")
 
 @input_error
 def delete_handler(*args):
     if len(args) == 0:
-        return "/// Invalid command. Please provide a name to delete."
+        return Failure("/// Invalid command. Please provide a name to delete.")
 
     name = args[0]
     if name in address_book:
         del address_book[name]
         return f"/// Contact \"{name}\" deleted successfully."
     else:
-        return f"/// Contact \"{name}\" not found."
+        return Failure(f"/// Contact \"{name}\" not found.")
 
 @input_error
 def search_handler(*args):
     if len(args) == 0:
-        return "/// Invalid command. Please provide a search term."
+        return Failure("/// Invalid command. Please provide a search term.")
 
     search_term = args[0].lower()
     matching_contacts = []
 
-    for contact in address_book.get_all_contacts():
-        if (search_term in str(contact.name).lower()) or any(search_term in str(phone.value).lower() for phone in contact.phones):
-            matching_contacts.append(contact)
+    if search_term.startswith("*") and search_term[1:].isdigit():
+        matching_contacts = address_book.find_by_phone_suffix(search_term[1:])
+    elif search_term.endswith("*") and search_term[:-1].lstrip("+").isdigit():
+        matching_contacts = address_book.find_by_phone_prefix(search_term[:-1])
+    elif search_term.startswith("+") and search_term[1:].isdigit():
+        matching_contacts = address_book.find_by_phone_prefix(search_term)
+    else:
+        for contact in address_book.get_all_contacts():
+            if (search_term in str(contact.name).lower()) or any(search_term in str(phone.value).lower() for phone in contact.phones):
+                matching_contacts.append(contact)
 
     if not matching_contacts:
         return f"/// No contacts found matching the search term: \"{search_term}\""
@@ -216,10 +249,27 @@ def search_handler(*args):
     output = [str(record) for record in matching_contacts]
     return "\n".join(output)
 
+@input_error
+def owner_handler(*args):
+    if len(args) == 0:
+        return Failure("/// Invalid command. Please provide a phone number or email.")
+
+    query = args[0]
+    if "@" in query:
+        owners = address_book.find_by_email(query)
+    elif normalize_phone(query):
+        owners = address_book.find_by_phone(query)
+    else:
+        return Failure("/// Invalid command. Please provide a phone number or email.")
+
+    if not owners:
+        return f"/// No contacts with phone number or email: {query}"
+    return "\n".join(str(record) for record in owners)
+
 @input_error
 def upcoming_birthdays_handler(*args):
     if len(args) == 0:
-        return "/// Invalid command. Please provide the number of days for upcoming birthdays."
+        return Failure("/// Invalid command. Please provide the number of days for upcoming birthdays.")
 
     try:
         days = int(args[0])
@@ -247,21 +297,72 @@ def upcoming_birthdays_handler(*args):
         return "\n".join(output)
 
     except ValueError:
-        return "/// Invalid number of days. Please provide a positive integer."
+        return Failure("/// Invalid number of days. Please provide a positive integer.")
+
+
+def current_session():
+    """State kept between commands: per client in serve mode, otherwise one for the whole session."""
+    session = client_session.get()
+    return local_session if session is None else session
+
+
+@input_error
+def dedupe_handler(*args):
+    session = current_session()
+    dedupe_candidates = session.get("dedupe_candidates", [])
+
+    if args and args[0] == "merge":
+        if not dedupe_candidates:
+            return Failure("/// No duplicates to merge. Run \"dedupe\" first.")
+        if args[1:] == ("all",):
+            accepted = dedupe_candidates
+        else:
+            numbers = [int(number) for number in args[1:]]
+            if any(number < 1 for number in numbers):
+                raise IndexError
+            accepted = [dedupe_candidates[number - 1] for number in numbers]
+        if not accepted:
+            return Failure("/// Invalid command. Provide 'all' or numbers of duplicates to merge.")
+        merged = dedupe.merge_duplicates(address_book, accepted)
+        session.pop("dedupe_candidates", None)
+        return f"/// {merged} contacts merged."
+
+    min_score = float(args[0]) if args else dedupe.MIN_SCORE
+    dedupe_candidates = session["dedupe_candidates"] = dedupe.find_duplicates(address_book, min_score)
+    if not dedupe_candidates:
+        return "/// No duplicate contacts found."
+    output = ["/// Possible duplicates (kept <- merged):"]
+    for number, candidate in enumerate(dedupe_candidates, start=1):
+        output.append(f"/// {number}. {candidate}")
+    return "\n".join(output)
+
+
+@input_error
+def stats_handler(*args):
+    global contact_stats
+
+    if not args or args[0] != "contacts":
+        return Failure("/// Invalid command. Example: stats contacts")
+    if contact_stats is None:
+        try:
+            contact_stats = ContactStats(address_book)
+        except ImportError as e:
+            return Failure(f"/// {e}")
+    return contact_stats.report()
 
     
 def show_contacts_page(page_number):
     contacts = address_book.get_all_contacts()
     total_pages = (len(contacts) - 1) // 10 + 1
     if page_number < 1 or page_number > total_pages:
-        return f"/// Invalid page number. Please provide a page number between 1 and {total_pages}."
+        return Failure(f"/// Invalid page number. Please provide a page number between 1 and {total_pages}.")
 
     page_size = 10
     start_index = (page_number - 1) * page_size
     end_index = start_index + page_size
     contacts_page = contacts[start_index:end_index]
     if not contacts_page:
-        return f"/// Page {page_number} is empty. Available pages: (1-{total_pages})."
+        return Failure(f"/// Page {page_number} is empty. Available pages: (1-{total_pages}).")
 
     header = f"/// --- Contacts Page {page_number}/{total_pages} --- "
     output = [str(record) for record in contacts_page]
@@ -274,7 +375,7 @@ def show_contacts_page(page_number):
 @input_error
 def show_all_handler(*args):
     if len(args) == 0:
-        return "/// Invalid command. Please provide 'all' or page number (e.g., '1', '2', 'sc all', 'sc 1', etc.)."
+        return Failure("/// Invalid command. Please provide 'all' or page number (e.g., '1', '2', 'sc all', 'sc 1', etc.).")
 
     if args[0] == "all":
         contacts = address_book.get_all_contacts()
@@ -288,46 +389,77 @@ def show_all_handler(*args):
             page_number = int(args[0])
             return show_contacts_page(page_number)
         except ValueError:
-            return "/// Invalid page number. Please provide a positive integer page number or 'all'."
+            return Failure("/// Invalid page number. Please provide a positive integer page number or 'all'.")
 
 def get_weather(*args):
     city = " ".join(args)
 
     if not city:
-        return "/// Invalid command. Please provide the name of a city for weather information."
+        return Failure("/// Invalid command. Please provide the name of a city for weather information.")
 
     url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-    response = requests.get(url)
+    response = requests.get(url, timeout=10)
     data = response.json()
     if data["cod"] == 200:
         temperature = data["main"]["temp"]
         weather_description = data["weather"][0]["description"]
         return f"/// The current weather in {city} is {weather_description}. Temperature: {temperature}°C"
     else:
-        return "/// Failed to retrieve weather information"
+        return Failure("/// Failed to retrieve weather information")
     
 def get_current_time():
     now = datetime.now()
     current_time = now.strftime("%H:%M:%S")
     return f"/// The current time is {current_time}"
 
-def sort_files(path):
+def sort_command(*args):
     sort_script_path = os.path.join(os.path.dirname(__file__), "sort.py")
-    try:
-        subprocess.run([sys.executable, sort_script_path, path], check=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        return False
+    return [sys.executable, sort_script_path, *args]
+
+
+def sort_result(returncode):
+    if returncode == 0:
+        return "/// Sorting finished."
+    return Failure(f"/// Sorting failed with exit code {returncode}.")
+
+
+def without_prompts(args):
+    if "-y" not in args and "--yes" not in args:
+        args = (*args, "--yes")
+    return args
+
+
+def sort_files(*args, interactive=True):
+    if interactive:
+        try:
+            return sort_result(subprocess.run(sort_command(*args)).returncode)
+        except KeyboardInterrupt:
+            # Ctrl+C is how "sort --watch" is stopped. It must not end the session.
+            return "/// Sorting stopped."
+    if "-w" in args or "--watch" in args:
+        return Failure("/// sort --watch never finishes and cannot run in batch mode.")
+    # Batch scripts cannot answer confirmation prompts, and stdin may be the script itself.
+    # The report goes into the result so it does not mix with the JSON lines.
+    process = subprocess.run(sort_command(*without_prompts(args)), stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE, text=True)
+    result = sort_result(process.returncode)
+    return type(result)(process.stdout + result)
+
+
+def sort_in_background(command, *args):
+    # A background job cannot answer confirmation prompts.
+    return job_runner.submit_process(command, sort_command(*without_prompts(args)), sort_result)
 
 
 def exit_handler(*args):
+    job_runner.shutdown()
     notebook.save_to_file(save_path)
     return "/// Good bye!"
 
 
 @input_error
 def unknown_handler(*args):
-    return "/// Invalid command. Type \"help\" to show all commands."
+    return Failure("/// Invalid command. Type \"help\" to show all commands.")
 
 def add_note_handler(*data):
      return notebook.add_note(*data)
@@ -346,6 +478,18 @@ def edit_note_handler(*data):
 def delete_note_handler(*data):
     return notebook.delete_note(*data)
 
+@input_error
+def jobs_handler(*args):
+    return job_runner.list_jobs()
+
+@input_error
+def wait_handler(*args):
+    return job_runner.wait(args[0])
+
+@input_error
+def cancel_handler(*args):
+    return job_runner.cancel(args[0])
+
 def find_closest_command(input_text):
     closest_command = ""
     max_similarity = 0
@@ -367,8 +511,11 @@ COMMANDS = {
     change_email_handler: ("changeemail", "ce"),
     change_name_handler: ("changename", "rename", "cn"),
     upcoming_birthdays_handler: ("upcomingbirthdays", "ub"),
+    dedupe_handler: ("dedupe", "dd"),
+    stats_handler: ("stats", "st"),
     delete_handler: ("delete", "d"),
     search_handler: ("search", "find", "f"),
+    owner_handler: ("owner", "ow"),
     exit_handler: ("bye", "exit", "break", "good bye", "close", "quit", "q"),
     show_all_handler: ("sc all", "showcontacts all", "sc", "showcontacts"),
     add_note_handler: ("addnote", "an"),
@@ -379,10 +526,54 @@ COMMANDS = {
     sort_files: ("sort", "s"),
     get_current_time: ("time", "t"),
     get_weather: ("weather", "w"),
+    jobs_handler: ("jobs",),
+    wait_handler: ("wait",),
+    cancel_handler: ("cancel",),
     short_commands_handler: ("shortcommands", "short"),
     help_handler: ("help", "h"),
 }
 
+MUTATING_COMMANDS = {
+    add_handler,
+    change_phone_handler,
+    change_birthdate_handler,
+    change_email_handler,
+    change_name_handler,
+    delete_handler,
+    dedupe_handler,
+    add_note_handler,
+    edit_note_handler,
+    delete_note_handler,
+}
+
+BACKGROUND_COMMANDS = {get_weather}
+
+# Commands that use neither contacts nor notes. In serve mode they run without the lock,
+# so a slow weather request does not hold up other clients.
+STATELESS_COMMANDS = {hello_handler, help_handler, short_commands_handler, get_weather, get_current_time}
+
+# Commands clients can call in serve mode. Exit, background jobs and sort only make sense
+# in an interactive session on the server's own terminal.
+SERVE_COMMANDS = {handler: keywords for handler, keywords in COMMANDS.items()
+                  if handler not in {exit_handler, jobs_handler, wait_handler, cancel_handler, sort_files}}
+
+# Commands that may run in background with "&". Jobs run in other threads without locks,
+# so commands that read or change contacts and notes always run in the foreground.
+BACKGROUND_ALLOWED = {sort_files, get_weather, get_current_time}
+
+COMPLETION_SOURCES = {
+    add_handler: lambda: address_book.name_trie,
+    change_phone_handler: lambda: address_book.name_trie,
+    change_birthdate_handler: lambda: address_book.name_trie,
+    change_email_handler: lambda: address_book.name_trie,
+    change_name_handler: lambda: address_book.name_trie,
+    delete_handler: lambda: address_book.name_trie,
+    search_handler: lambda: address_book.name_trie,
+    view_note_handler: lambda: notebook.title_trie,
+    edit_note_handler: lambda: notebook.title_trie,
+    delete_note_handler: lambda: notebook.title_trie,
+}
+
 
 def parser(text: str):
     if not text.strip():
@@ -398,9 +589,85 @@ def parser(text: str):
     return unknown_handler, []
 
 
+def save_all():
+    address_book.save_data()
+    notebook.save_to_file(save_path)
+
+
+def run_batch(source, save_every=0):
+    processed = 0
+    failed = 0
+
+    for line_no, line in enumerate(source, start=1):
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+
+        cmd, data = parser(text)
+        entry = {"line": line_no, "command": text}
+
+        if cmd == unknown_handler:
+            entry.update(ok=False, error=f"Unknown command: {text.split()[0]}")
+        elif cmd == exit_handler:
+            break
+        else:
+            try:
+                result = sort_files(*data, interactive=False) if cmd == sort_files else cmd(*data)
+                if isinstance(result, Failure):
+                    entry.update(ok=False, error=result)
+                else:
+                    entry.update(ok=True, result=result)
+            except Exception as e:
+                entry.update(ok=False, error=str(e))
+
+        if not entry["ok"]:
+            failed += 1
+        processed += 1
+        print(json.dumps(entry, ensure_ascii=False, default=str))
+
+        if save_every and processed % save_every == 0:
+            save_all()
+
+    save_all()
+    return processed, failed
+
+
 def main():
+    arg_parser = argparse.ArgumentParser(prog="dedalusrun", description=bot_ver)
+    arg_parser.add_argument("--batch", metavar="FILE",
+                            help="run commands from FILE (or '-' for stdin) without prompts, one JSON result per line")
+    arg_parser.add_argument("--save-every", metavar="N", type=int, default=0,
+                            help="in batch or serve mode, save data every N commands (default: only at the end)")
+    arg_parser.add_argument("--save-interval", metavar="SECONDS", type=int, default=60,
+                            help="in serve mode, save changed data every SECONDS (default: 60, 0 to disable)")
+    arg_parser.add_argument("--serve", action="store_true",
+                            help="serve one shared address book and notebook to local clients")
+    arg_parser.add_argument("--socket", metavar="PATH", help="in serve mode, listen on a Unix socket instead of TCP")
+    arg_parser.add_argument("--host", default="127.0.0.1", help="in serve mode, TCP host (default: 127.0.0.1)")
+    arg_parser.add_argument("--port", type=int, default=8765, help="in serve mode, TCP port (default: 8765)")
+    args = arg_parser.parse_args()
+
     notebook.load_from_file(save_path)
 
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, args.save_every)
+        else:
+            with open(args.batch, encoding="utf-8") as source:
+                run_batch(source, args.save_every)
+        return
+
+    if args.serve:
+        server = DedalusServer(SERVE_COMMANDS, parser, MUTATING_COMMANDS, save_all, args.save_every,
+                               args.save_interval, STATELESS_COMMANDS)
+        try:
+            asyncio.run(server.serve(args.socket, args.host, args.port))
+        except KeyboardInterrupt:
+            print("/// Server stopped.")
+        return
+
+    install_completer(COMMANDS, parser, COMPLETION_SOURCES)
+
     print(f"/// \U0001F916 {bot_ver} loaded. Waiting for command. \"help\" to show list of all commands.")
 
     while True:
@@ -408,10 +675,27 @@ def main():
 
         cmd, data = parser(user_input)
 
+        # A separate trailing "&" runs the command in background. Other commands get it as text.
+        background = cmd in BACKGROUND_ALLOWED and data[-1:] == ["&"]
+        if background:
+            data = data[:-1]
+            user_input = user_input.rstrip()[:-1]
+
         if cmd == unknown_handler:
             print(f"/// Invalid command. Did you mean '{find_closest_command(user_input)}'?")
             continue
 
+        reloaded = address_book.refresh()
+        if reloaded:
+            print(f"/// Address book was changed by another session: {reloaded} contacts reloaded.")
+
+        if background or cmd in BACKGROUND_COMMANDS:
+            if cmd == sort_files:
+                print(sort_in_background(user_input.strip(), *data))
+            else:
+                print(job_runner.submit(user_input.strip(), cmd, *data))
+            continue
+
         try:
             result = cmd(*data)
             print(result)
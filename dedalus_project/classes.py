@@ -1,7 +1,14 @@
-import json, phonenumbers, re
+import hashlib, json, os, phonenumbers, re
 from typing import Optional
 from collections import UserDict
+from contextlib import contextmanager
 from datetime import date, datetime
+from trie import Trie
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
 
 class WrongPhoneNumber(Exception):
     pass
@@ -12,6 +19,38 @@ class WrongBirthdate(Exception):
 class WrongEmail(Exception):
     pass
 
+class DuplicateEntry(Exception):
+    pass
+
+class Failure(str):
+    """A handler message that reports a failed command. Prints like any other message."""
+
+NOT_DIGITS_PATTERN = re.compile(r"\D")
+
+
+def normalize_phone(value) -> str:
+    return NOT_DIGITS_PATTERN.sub("", str(value))
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on path, held by every process that saves the address book."""
+    with open(path, "a+b") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
 class Field:
     def __init__(self, value) -> None:
         self._value = value
@@ -123,12 +162,42 @@ class Record:
             self.phones = []
         else:
             self.phones = [Phone(phones)] if isinstance(phones, str) else [Phone(phone) for phone in phones]
+        self.book = None
         self.birthday = birthday
+        self._email = None
         self.email = email
 
+    @property
+    def birthday(self):
+        return self._birthday
+
+    @birthday.setter
+    def birthday(self, birthday):
+        if birthday is not None and not isinstance(birthday, Birthday):
+            birthday = Birthday(birthday)
+        self._birthday = birthday
+        if self.book is not None:
+            self.book.touch()
+
+    @property
+    def email(self):
+        return self._email
+
+    @email.setter
+    def email(self, email):
+        if email is not None and not isinstance(email, Email):
+            email = Email(email)
+        if self.book is not None:
+            self.book.reindex_email(self, self._email, email)
+        self._email = email
+
     def add_phone(self, phone):
         new_phone = Phone(phone)
+        if self.book is not None:
+            self.book.check_phone(self, new_phone.value)
         self.phones.append(new_phone)
+        if self.book is not None:
+            self.book.index_phone(self, new_phone.value)
         return f"/// Contact {self.name}: {new_phone.value} added successfully"
 
     def add_email(self, email):
@@ -140,7 +209,12 @@ class Record:
         new_phone = Phone(new_phone)
 
         if old_phone.value in [phone.value for phone in self.phones]:
+            if self.book is not None:
+                self.book.check_phone(self, new_phone.value)
             self.phones = [new_phone if phone.value == old_phone.value else phone for phone in self.phones]
+            if self.book is not None:
+                self.book.unindex_phone(self, old_phone.value)
+                self.book.index_phone(self, new_phone.value)
             return f"/// Phone number changed from {old_phone.value} to {new_phone.value} for contact {self.name}"
         else:
             return f"/// Phone number {old_phone.value} not found for contact {self.name}"
@@ -169,14 +243,156 @@ class Record:
 
 
 class AddressBook(UserDict):
-    def __init__(self):
+    def __init__(self, unique_phones=False, unique_emails=False):
         super().__init__()
         self.file_path = "address_book.json"
+        self.lock_path = self.file_path + ".lock"
+        # Generation written in the file we last loaded or saved, the file's stat at that moment
+        # and a content hash per contact, used to find out cheaply what changed on disk.
+        self.generation = 0
+        self._disk_state = None
+        self._hashes = {}
+        self.phone_index = {}
+        self.email_index = {}
+        self.phone_prefixes = Trie()
+        self.phone_suffixes = Trie()
+        self._name_trie = None
+        # Incremented on every change, so derived data (e.g. statistics) knows when to rebuild.
+        self.version = 0
+        self.unique_phones = unique_phones
+        self.unique_emails = unique_emails
         self.load_data()
 
+    @contextmanager
+    def _unchecked(self):
+        # Saved data may already hold duplicates, so uniqueness is only enforced for new changes.
+        unique = self.unique_phones, self.unique_emails
+        self.unique_phones = self.unique_emails = False
+        try:
+            yield
+        finally:
+            self.unique_phones, self.unique_emails = unique
+
     def add_record(self, name, phone, birthday=None, email=None):
         record = Record(name, phone, birthday, email)
+        self[name] = record
+
+    def touch(self):
+        self.version += 1
+
+    def __setitem__(self, name, record: Record):
+        # Check everything first, so a rejected record leaves the book untouched.
+        replaced = self.data.get(name)
+        for phone in record.phones:
+            self.check_phone(record, phone.value, replaced)
+        self.check_email(record, record.email, replaced)
+
+        if replaced is not None:
+            del self[name]
         self.data[name] = record
+        record.book = self
+        for phone in record.phones:
+            self.index_phone(record, phone.value)
+        self.reindex_email(record, None, record.email)
+        if self._name_trie is not None:
+            self._name_trie.add(name.lower(), name)
+        self.touch()
+
+    def __delitem__(self, name):
+        record = self.data.pop(name)
+        for digits in {normalize_phone(phone.value) for phone in record.phones}:
+            self._unindex_digits(record, digits)
+        self.reindex_email(record, record.email, None)
+        record.book = None
+        if self._name_trie is not None:
+            self._name_trie.remove(name.lower(), name)
+        self.touch()
+
+    def rename(self, old_name: str, new_name: str) -> Record:
+        record = self.data[old_name]
+        # Keys are stored as typed, like in add, so the new name finds the contact again.
+        name = Name(new_name)
+        if name.value != old_name and name.value in self.data:
+            raise DuplicateEntry(f"Contact {name} already exists.")
+        del self.data[old_name]
+        record.name = name
+        self.data[name.value] = record
+        if self._name_trie is not None:
+            self._name_trie.remove(old_name.lower(), old_name)
+            self._name_trie.add(name.value.lower(), name.value)
+        self.touch()
+        return record
+
+    @property
+    def name_trie(self) -> Trie:
+        """Lowercased contact names mapped to names. Built on first use, then kept up to date."""
+        if self._name_trie is None:
+            self._name_trie = Trie()
+            for name in self.data:
+                self._name_trie.add(name.lower(), name)
+        return self._name_trie
+
+    def check_phone(self, record: Record, phone: str, replaced: Optional[Record] = None):
+        if not self.unique_phones:
+            return
+        for owner in self.phone_index.get(normalize_phone(phone), ()):
+            if owner is not record and owner is not replaced:
+                raise DuplicateEntry(f"Phone number {phone} already belongs to contact {owner.name}.")
+
+    def check_email(self, record: Record, email, replaced: Optional[Record] = None):
+        if not self.unique_emails or email is None:
+            return
+        for owner in self.email_index.get(str(email).lower(), ()):
+            if owner is not record and owner is not replaced:
+                raise DuplicateEntry(f"Email {email} already belongs to contact {owner.name}.")
+
+    def reindex_email(self, record: Record, old_email, new_email):
+        self.check_email(record, new_email)
+        if old_email is not None:
+            key = str(old_email).lower()
+            owners = self.email_index.get(key, set())
+            owners.discard(record)
+            if not owners:
+                self.email_index.pop(key, None)
+        if new_email is not None:
+            self.email_index.setdefault(str(new_email).lower(), set()).add(record)
+        self.touch()
+
+    def index_phone(self, record: Record, phone: str):
+        digits = normalize_phone(phone)
+        self.phone_index.setdefault(digits, set()).add(record)
+        self.phone_prefixes.add(digits, record)
+        self.phone_suffixes.add(digits[::-1], record)
+        self.touch()
+
+    def unindex_phone(self, record: Record, phone: str):
+        digits = normalize_phone(phone)
+        # Another phone of the same record may normalize to the same digits.
+        if not any(normalize_phone(p.value) == digits for p in record.phones):
+            self._unindex_digits(record, digits)
+
+    def _unindex_digits(self, record: Record, digits: str):
+        owners = self.phone_index.get(digits, set())
+        owners.discard(record)
+        if not owners:
+            self.phone_index.pop(digits, None)
+        self.phone_prefixes.remove(digits, record)
+        self.phone_suffixes.remove(digits[::-1], record)
+        self.touch()
+
+    def find_by_phone(self, phone: str) -> list:
+        return list(self.phone_index.get(normalize_phone(phone), ()))
+
+    def find_by_email(self, email: str) -> list:
+        return list(self.email_index.get(str(email).lower(), ()))
+
+    def find_by_phone_prefix(self, prefix: str) -> list:
+        digits = normalize_phone(prefix)
+        return list(self.phone_prefixes.values(digits)) if digits else []
+
+    def find_by_phone_suffix(self, suffix: str) -> list:
+        digits = normalize_phone(suffix)
+        return list(self.phone_suffixes.values(digits[::-1])) if digits else []
 
     def get(self, name: str) -> Optional[Record]:
         return self.data.get(name)
@@ -187,44 +403,120 @@ class AddressBook(UserDict):
     def __iter__(self):
         return AddressBookIterator(self.data.values())
 
-    def save_data(self):
-        data = {
-            "contacts": [
-                {
-                    "name": record.name.value,
-                    "phones": [str(phone) for phone in record.phones],
-                    "birthday": str(record.birthday) if record.birthday else None,
-                    "email": str(record.email) if record.email else None
-                }
-                for record in self.get_all_contacts()
-            ]
+    @staticmethod
+    def contact_data(record: Record) -> dict:
+        return {
+            "name": record.name.value,
+            "phones": [str(phone) for phone in record.phones],
+            "birthday": str(record.birthday) if record.birthday else None,
+            "email": str(record.email) if record.email else None
         }
-        with open(self.file_path, "w") as file:
-            json.dump(data, file, indent=4)
 
-    def load_data(self):
-        try:
-            with open(self.file_path, "r") as file:
-                data = json.load(file)
+    @staticmethod
+    def contact_hash(contact_data: dict) -> str:
+        return hashlib.blake2b(json.dumps(contact_data, sort_keys=True).encode(), digest_size=16).hexdigest()
 
-            for contact_data in data.get("contacts", []):
-                name = contact_data.get("name")
-                phones = contact_data.get("phones", [])
-                birthday_str = contact_data.get("birthday")
-                email_str = contact_data.get("email")
+    def _record_from_data(self, contact_data: dict) -> Record:
+        birthday_str = contact_data.get("birthday")
+        email_str = contact_data.get("email")
 
-                birthday = None
-                if birthday_str:
-                    birthday = Birthday(datetime.strptime(birthday_str, "%d.%m.%Y").date())
+        birthday = None
+        if birthday_str:
+            birthday = Birthday(datetime.strptime(birthday_str, "%d.%m.%Y").date())
 
-                email = None
-                if email_str:
-                    email = Email(email_str)
-                
-                self.add_record(name, phones, birthday, email)
+        email = None
+        if email_str:
+            email = Email(email_str)
 
+        return Record(contact_data.get("name"), contact_data.get("phones", []), birthday, email)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read(self):
+        state = self._stat()
+        try:
+            with open(self.file_path, "r") as file:
+                data = json.load(file)
         except (FileNotFoundError, json.JSONDecodeError):
-            pass
+            data = {}
+        return data, state
+
+    def changed_on_disk(self) -> bool:
+        return self._stat() != self._disk_state
+
+    def is_modified(self, name) -> bool:
+        """True if the contact changed here since it was last loaded or saved."""
+        record = self.data.get(name)
+        if record is None:
+            return name in self._hashes
+        return self.contact_hash(self.contact_data(record)) != self._hashes.get(name)
+
+    def refresh(self) -> int:
+        """Apply changes another session saved to the file and return the number of contacts updated.
+
+        Only a stat is done while the file is unchanged. Otherwise only contacts whose hash differs
+        from the last sync are validated and replaced. Contacts modified here as well keep the local version.
+        """
+        if not self.changed_on_disk():
+            return 0
+        data, state = self._read()
+        generation = data.get("generation", 0)
+        if generation and generation == self.generation:
+            self._disk_state = state
+            return 0
+
+        on_disk = {contact["name"]: contact for contact in data.get("contacts", [])}
+        updated = 0
+        with self._unchecked():
+            for name, contact in on_disk.items():
+                contact_hash = self.contact_hash(contact)
+                if self._hashes.get(name) == contact_hash or self.is_modified(name):
+                    continue
+                self[name] = self._record_from_data(contact)
+                self._hashes[name] = contact_hash
+                updated += 1
+            for name in [name for name in self._hashes if name not in on_disk]:
+                if not self.is_modified(name):
+                    if name in self.data:
+                        del self[name]
+                    del self._hashes[name]
+                    updated += 1
+
+        self.generation = generation
+        self._disk_state = state
+        return updated
+
+    def save_data(self):
+        with file_lock(self.lock_path):
+            self.refresh()
+            contacts = [self.contact_data(record) for record in self.get_all_contacts()]
+            data = {"generation": self.generation + 1, "contacts": contacts}
+
+            temp_path = self.file_path + ".tmp"
+            with open(temp_path, "w") as file:
+                json.dump(data, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.file_path)
+
+            self.generation += 1
+            self._disk_state = self._stat()
+            self._hashes = {contact["name"]: self.contact_hash(contact) for contact in contacts}
+
+    def load_data(self):
+        data, state = self._read()
+        with self._unchecked():
+            for contact_data in data.get("contacts", []):
+                record = self._record_from_data(contact_data)
+                self[record.name.value] = record
+                self._hashes[record.name.value] = self.contact_hash(contact_data)
+        self.generation = data.get("generation", 0)
+        self._disk_state = state
 
 
 class AddressBookIterator:
@@ -0,0 +1,82 @@
+import argparse, asyncio, json, time
+
+
+class DedalusClient:
+    def __init__(self, socket_path=None, host="127.0.0.1", port=8765):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.next_id = 0
+
+    async def connect(self):
+        if self.socket_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, command):
+        self.next_id += 1
+        self.writer.write(json.dumps({"id": self.next_id, "command": command}).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(line)
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+async def run_commands(commands, **address):
+    client = await DedalusClient(**address).connect()
+    try:
+        for command in commands:
+            response = await client.request(command)
+            print(response["result"] if response["ok"] else f"/// Error: {response['error']}")
+    finally:
+        await client.close()
+
+
+async def load_test(clients, requests_per_client, write_every=10, **address):
+    async def worker(n):
+        client = await DedalusClient(**address).connect()
+        try:
+            for i in range(requests_per_client):
+                if write_every and i % write_every == 0:
+                    await client.request(f"add Load{n} +38050{n * requests_per_client + i:07d}")
+                else:
+                    await client.request(f"search Load{n}")
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    total = clients * requests_per_client
+    print(f"/// {total} requests from {clients} clients in {elapsed:.2f}s: {total / elapsed:.0f} requests/s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Client for dedalusrun --serve")
+    arg_parser.add_argument("command", nargs="*", help="commands to send, e.g. \"search John\"")
+    arg_parser.add_argument("--socket", metavar="PATH", help="Unix socket of the server")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--load-test", nargs=2, type=int, metavar=("CLIENTS", "REQUESTS"),
+                            help="run a load test with CLIENTS concurrent clients sending REQUESTS each")
+    args = arg_parser.parse_args()
+
+    address = {"socket_path": args.socket, "host": args.host, "port": args.port}
+    if args.load_test:
+        asyncio.run(load_test(*args.load_test, **address))
+    else:
+        asyncio.run(run_commands(args.command, **address))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+try:
+    import readline
+except ImportError:
+    readline = None
+from trie import Trie
+
+MAX_COMPLETIONS = 100
+
+
+class Completer:
+    """Tab completion for the REPL.
+
+    The first word completes to a command keyword. The first argument of a command
+    listed in argument_tries completes from the trie returned by its callable,
+    e.g. contact names or note titles. Tries map lowercased keys to the original text,
+    so completion ignores case.
+    """
+
+    def __init__(self, commands, parser, argument_tries):
+        self.parser = parser
+        self.argument_tries = argument_tries
+        self.keywords = Trie()
+        for keywords in commands.values():
+            for keyword in keywords:
+                if " " not in keyword:
+                    self.keywords.add(keyword, keyword)
+        self.matches = []
+
+    def candidates(self, line: str, text: str) -> list:
+        words = line.split()
+        if not words:
+            trie = self.keywords
+        elif len(words) == 1:
+            handler, _ = self.parser(words[0])
+            get_trie = self.argument_tries.get(handler)
+            if get_trie is None:
+                return []
+            trie = get_trie()
+        else:
+            return []
+        return sorted({value for _, value in trie.items(text.lower(), MAX_COMPLETIONS)})
+
+    def complete(self, text: str, state: int):
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            self.matches = self.candidates(line, text)
+        return self.matches[state] if state < len(self.matches) else None
+
+
+def install_completer(commands, parser, argument_tries) -> bool:
+    if readline is None:
+        return False
+    completer = Completer(commands, parser, argument_tries)
+    readline.set_completer(completer.complete)
+    readline.set_completer_delims(" \t\n")
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+    return True
@@ -0,0 +1,164 @@
+import difflib, re
+from classes import normalize_phone
+from normalize import normalize
+
+MAX_BLOCK_SIZE = 50
+MIN_SCORE = 0.6
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class Candidate:
+    def __init__(self, score, keep, drop, reasons):
+        self.score = score
+        self.keep = keep
+        self.drop = drop
+        self.reasons = reasons
+
+    def __str__(self):
+        return f"{self.keep} <- {self.drop} ({self.score:.2f}): {', '.join(self.reasons)}"
+
+
+def normalize_name(name) -> str:
+    name = normalize(str(name)).lower()
+    return name if name.isalnum() else " ".join(WORD_PATTERN.findall(name))
+
+
+class Profile:
+    """Normalized fields of a record that are used for blocking and scoring."""
+
+    __slots__ = ("name", "phones", "email", "birthday")
+
+    def __init__(self, record):
+        self.name = normalize_name(record.name)
+        self.phones = {normalize_phone(phone.value) for phone in record.phones}
+        self.email = str(record.email).lower() if record.email else None
+        self.birthday = str(record.birthday) if record.birthday else None
+
+    def blocking_keys(self):
+        keys = list(self.phones)
+        if self.email:
+            keys.append(self.email)
+        if self.name:
+            keys.append(self.name)
+        return keys
+
+
+def score_pair(a: Profile, b: Profile):
+    """Combine independent evidence as 1 - product(1 - p). Returns (score, reasons)."""
+    evidence = []
+    reasons = []
+
+    if a.phones & b.phones:
+        evidence.append(0.8)
+        reasons.append("same phone")
+    if a.email and a.email == b.email:
+        evidence.append(0.8)
+        reasons.append("same email")
+    if a.name == b.name:
+        evidence.append(0.9)
+        reasons.append("same name")
+    else:
+        ratio = difflib.SequenceMatcher(None, a.name, b.name).ratio()
+        if ratio >= 0.7:
+            evidence.append(0.9 * ratio ** 2)
+            reasons.append(f"similar name {ratio:.2f}")
+
+    miss = 1.0
+    for p in evidence:
+        miss *= 1 - p
+    score = 1 - miss
+
+    if a.birthday and b.birthday:
+        if a.birthday == b.birthday:
+            score = 1 - (1 - score) * 0.7
+            reasons.append("same birthday")
+        else:
+            score *= 0.5
+            reasons.append("different birthday")
+    return score, reasons
+
+
+def _richness(record):
+    return len(record.phones) + bool(record.email) + bool(record.birthday)
+
+
+def find_duplicates(book, min_score=MIN_SCORE, max_block_size=MAX_BLOCK_SIZE):
+    """Find likely duplicate contacts, comparing only records that share a blocking key.
+
+    Blocks larger than max_block_size (e.g. a very common name) are skipped to keep the work linear.
+    Returns candidates sorted by score, best first.
+    """
+    profiles = {}
+    # Most blocks have a single member, so a block holds a bare key until a second one arrives.
+    # Phone digits, emails and names share one dict: a collision between kinds only costs a comparison.
+    blocks = {}
+    for key, record in book.data.items():
+        profile = profiles[key] = Profile(record)
+        for block_key in profile.blocking_keys():
+            members = blocks.get(block_key)
+            if members is None:
+                blocks[block_key] = key
+            elif type(members) is list:
+                members.append(key)
+            else:
+                blocks[block_key] = [members, key]
+
+    compared = set()
+    candidates = []
+    for members in blocks.values():
+        if type(members) is not list or len(members) > max_block_size:
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                pair = (first, second) if first < second else (second, first)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                score, reasons = score_pair(profiles[first], profiles[second])
+                if score >= min_score:
+                    a, b = book.data[pair[0]], book.data[pair[1]]
+                    keep, drop = pair if _richness(a) >= _richness(b) else pair[::-1]
+                    candidates.append(Candidate(score, keep, drop, reasons))
+
+    candidates.sort(key=lambda c: (-c.score, c.keep, c.drop))
+    return candidates
+
+
+def merge_duplicates(book, candidates):
+    """Merge accepted candidates in one batch. Chains like A <- B <- C end up in one record.
+
+    Phones, email and birthday of dropped records are moved to the kept record through the
+    AddressBook and Record methods, so every index is updated. Returns the number of merged records.
+    """
+    parent = {}
+
+    def find(key):
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    for candidate in candidates:
+        if candidate.keep not in book.data or candidate.drop not in book.data:
+            continue
+        keep, drop = find(candidate.keep), find(candidate.drop)
+        if keep != drop:
+            parent[drop] = keep
+
+    # Moving a value from a dropped record to the kept one never creates a new duplicate,
+    # so the batch runs without uniqueness checks and cannot fail halfway.
+    with book._unchecked():
+        for drop in list(parent):
+            source = book.data[drop]
+            target = book.data[find(drop)]
+            known = {normalize_phone(phone.value) for phone in target.phones}
+            for phone in source.phones:
+                if normalize_phone(phone.value) not in known:
+                    known.add(normalize_phone(phone.value))
+                    target.add_phone(phone.value)
+            if not target.email and source.email:
+                target.email = source.email
+            if not target.birthday and source.birthday:
+                target.birthday = source.birthday
+            del book[drop]
+    return len(parent)
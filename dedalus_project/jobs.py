@@ -0,0 +1,122 @@
+import itertools, subprocess, threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from classes import Failure
+
+
+class Job:
+    def __init__(self, job_id, command, stoppable=False):
+        self.id = job_id
+        self.command = command
+        self.future = None
+        # Only jobs that run an external program can be stopped once they are running.
+        self.stoppable = stoppable
+        self.process = None
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    @property
+    def status(self):
+        if self.stopped:
+            return "stopped"
+        if self.future.cancelled():
+            return "cancelled"
+        if self.future.running():
+            return "running"
+        if self.future.done():
+            return "failed" if self.future.exception() else "done"
+        return "queued"
+
+    def result_text(self):
+        if self.stopped:
+            return Failure("/// Job was stopped.")
+        try:
+            return str(self.future.result())
+        except CancelledError:
+            return Failure("/// Job was cancelled.")
+        except Exception as e:
+            return Failure(f"/// Error: {e}")
+
+    def stop(self) -> bool:
+        if not self.stoppable:
+            return False
+        with self.lock:
+            self.stopped = True
+            if self.process is not None and self.process.poll() is None:
+                self.process.terminate()
+        return True
+
+    def __str__(self):
+        return f"/// [{self.id}] {self.status}: {self.command}"
+
+
+class JobRunner:
+    def __init__(self, max_workers=4, notify=print):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dedalus-job")
+        self.jobs = {}
+        self.notify = notify
+        self._ids = itertools.count(1)
+
+    def submit(self, command, handler, *args):
+        return self._start(Job(next(self._ids), command), lambda job: handler(*args))
+
+    def submit_process(self, command, args, describe):
+        """Run an external program as a job that cancel and shutdown can stop while it runs.
+
+        describe turns the exit code of the program into the job result.
+        """
+        def run(job):
+            with job.lock:
+                if job.stopped:
+                    return None
+                job.process = subprocess.Popen(args, stdin=subprocess.DEVNULL)
+            return describe(job.process.wait())
+        return self._start(Job(next(self._ids), command, stoppable=True), run)
+
+    def _start(self, job, run):
+        job.future = self.executor.submit(run, job)
+        self.jobs[job.id] = job
+        job.future.add_done_callback(lambda future: self._report(job))
+        return f"/// [{job.id}] Started in background: {job.command}"
+
+    def _report(self, job):
+        if not job.future.cancelled() and not job.stopped:
+            self.notify(f"\n/// [{job.id}] Finished: {job.command}\n{job.result_text()}")
+
+    def _get(self, job_id):
+        try:
+            return self.jobs[int(job_id)]
+        except (KeyError, ValueError):
+            return None
+
+    def list_jobs(self):
+        if not self.jobs:
+            return "/// No background jobs."
+        return "\n".join(str(job) for job in self.jobs.values())
+
+    def wait(self, job_id):
+        job = self._get(job_id)
+        if job is None:
+            return Failure(f"/// No job with id: {job_id}")
+        text = job.result_text()
+        del self.jobs[job.id]
+        return text
+
+    def cancel(self, job_id):
+        job = self._get(job_id)
+        if job is None:
+            return Failure(f"/// No job with id: {job_id}")
+        if job.future.cancel():
+            del self.jobs[job.id]
+            return f"/// [{job.id}] Cancelled: {job.command}"
+        if job.future.done():
+            return Failure(f"/// [{job.id}] Already finished. Use \"wait {job.id}\" to see the result.")
+        if not job.stop():
+            return Failure(f"/// [{job.id}] Already running and cannot be cancelled.")
+        del self.jobs[job.id]
+        return f"/// [{job.id}] Stopped: {job.command}"
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Handlers cannot be interrupted, but external programs such as "sort --watch" are stopped.
+        for job in list(self.jobs.values()):
+            job.stop()
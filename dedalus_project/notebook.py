@@ -1,29 +1,43 @@
 import os
 import pickle
+from trie import Trie
+from classes import Failure
 
 
 class Notebook:
     def __init__(self):
         self.notes = {}
+        self._title_trie = None
+
+    @property
+    def title_trie(self):
+        """Lowercased note titles mapped to titles. Built on first use, then kept up to date."""
+        if self._title_trie is None:
+            self._title_trie = Trie()
+            for title in self.notes:
+                self._title_trie.add(title.lower(), title)
+        return self._title_trie
 
     def add_note(self, *parameters):
         if len(parameters) < 2:
-            return '/// Please enter title and content.'
+            return Failure('/// Please enter title and content.')
 
         title = parameters[0]
         content = parameters[1:]
         self.notes[title] = ' '.join(content)
+        if self._title_trie is not None:
+            self._title_trie.add(title.lower(), title)
         return f'/// Note with title: "{title}" added.'
 
     def view_note(self, *parameters):
         if len(parameters) != 1:
-            return '/// Please enter the title, to view.'
+            return Failure('/// Please enter the title, to view.')
 
         title = parameters[0]
         if title in self.notes:
             return f'/// Title: {title}\Content: {self.notes[title]}'
         else:
-            return f'/// Note with title: "{title}" was not found.'
+            return Failure(f'/// Note with title: "{title}" was not found.')
 
     def show_all_notes(self):
         if not self.notes:
@@ -36,12 +50,12 @@ class Notebook:
 
     def edit_note(self, *parameters):
         if len(parameters) < 2:
-            return '/// Please enter title and new content.'
+            return Failure('/// Please enter title and new content.')
         title = parameters[0]
         if title in self.notes:
             del self.notes[title]
         else:
-            return f'/// Note with title: "{title}" was not found.'
+            return Failure(f'/// Note with title: "{title}" was not found.')
         title = parameters[0]
         content = parameters[1:]
         self.notes[title] = ' '.join(content)
@@ -49,20 +63,23 @@ class Notebook:
 
     def delete_note(self, *parameters):
         if len(parameters) != 1:
-            return '/// Please enter the title, for deletion.'
+            return Failure('/// Please enter the title, for deletion.')
 
         title = parameters[0]
         if title in self.notes:
             del self.notes[title]
+            if self._title_trie is not None:
+                self._title_trie.remove(title.lower(), title)
             return f'/// Note with title: "{title}" deleted.'
         else:
-            return f'/// Note with title: "{title}" was not found.'
+            return Failure(f'/// Note with title: "{title}" was not found.')
 
     def save_to_file(self, filename):
         with open(filename, mode="wb") as file:
             pickle.dump(self.notes, file)
 
     def load_from_file(self, filename):
+        self._title_trie = None
         try:
             with open(filename, 'rb') as f:
                 if os.stat(filename).st_size == 0:
@@ -0,0 +1,157 @@
+import asyncio, contextvars, json, os, signal
+from contextlib import asynccontextmanager, suppress
+from classes import Failure
+
+# State of the client connection being served, e.g. results a later command refers to.
+# Handlers run through asyncio.to_thread, which copies the context, so they see the same dict.
+client_session = contextvars.ContextVar("client_session", default=None)
+
+
+class ReadWriteLock:
+    """Many readers or one writer. Waiting writers block new readers so mutations are not starved."""
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def reading(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def writing(self):
+        async with self._cond:
+            self._waiting_writers += 1
+            try:
+                await self._cond.wait_for(lambda: not self._writer and self._readers == 0)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class DedalusServer:
+    """Serves the bot commands over a local socket with a line-delimited JSON protocol.
+
+    Request:  {"id": 1, "command": "add John +380501234567"}
+    Response: {"id": 1, "ok": true, "result": "/// Contact John: ..."}
+
+    Only handlers in commands can be called. Handlers run in worker threads.
+    Mutating handlers run one at a time, the rest run concurrently.
+    Handlers in unlocked use no shared data (e.g. network calls) and never wait for the lock.
+    Changes are saved every save_every mutations, every save_interval seconds and when the server stops.
+    """
+
+    def __init__(self, commands, parser, mutating, persist, save_every=0, save_interval=60, unlocked=()):
+        self.commands = commands
+        self.parser = parser
+        self.mutating = mutating
+        self.unlocked = unlocked
+        self.persist = persist
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.lock = ReadWriteLock()
+        self.mutations = 0
+        self.saved_mutations = 0
+
+    async def execute(self, text):
+        handler, data = self.parser(text)
+        if handler not in self.commands:
+            return {"ok": False, "error": f"Unknown or unavailable command: {text}"}
+
+        try:
+            if handler in self.unlocked:
+                result = await asyncio.to_thread(handler, *data)
+            elif handler in self.mutating:
+                async with self.lock.writing():
+                    result = await asyncio.to_thread(handler, *data)
+                    self.mutations += 1
+                    if self.save_every and self.mutations % self.save_every == 0:
+                        await asyncio.to_thread(self.persist)
+                        self.saved_mutations = self.mutations
+            else:
+                async with self.lock.reading():
+                    result = await asyncio.to_thread(handler, *data)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        if isinstance(result, Failure):
+            return {"ok": False, "error": result}
+        return {"ok": True, "result": result}
+
+    async def handle_client(self, reader, writer):
+        client_session.set({})
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    text = request["command"]
+                except (ValueError, KeyError, TypeError):
+                    response = {"ok": False, "error": "Invalid request. Expected {\"command\": \"...\"}"}
+                else:
+                    response = await self.execute(text)
+                    if isinstance(request, dict) and "id" in request:
+                        response["id"] = request["id"]
+                writer.write(json.dumps(response, ensure_ascii=False, default=str).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def save(self):
+        async with self.lock.reading():
+            await asyncio.to_thread(self.persist)
+            self.saved_mutations = self.mutations
+
+    async def autosave(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            if self.mutations != self.saved_mutations:
+                try:
+                    await self.save()
+                except OSError as e:
+                    print(f"/// Saving failed: {e}")
+
+    async def serve(self, socket_path=None, host="127.0.0.1", port=8765):
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+            address = socket_path
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            address = f"{host}:{port}"
+
+        # SIGTERM and SIGHUP stop the server like Ctrl+C, so the data is saved below.
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for name in ("SIGTERM", "SIGHUP"):
+            with suppress(AttributeError, NotImplementedError):
+                loop.add_signal_handler(getattr(signal, name), stop.set)
+        autosave = asyncio.create_task(self.autosave()) if self.save_interval else None
+
+        print(f"/// Serving on {address}. Press Ctrl+C to stop.")
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if autosave:
+                autosave.cancel()
+            await self.save()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
@@ -1,4 +1,5 @@
-import sys, shutil
+import argparse, ctypes, ctypes.util, errno, os, select, shutil, struct, sys, time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from normalize import normalize
 
@@ -9,12 +10,72 @@ CATEGORIES = {"Images": [".jpeg", ".png", ".jpg", ".svg", ".apng", ".avif", ".gi
               "Audio": [".mp3", ".aiff", ".ogg", ".wav", ".amr"],
               "Archives": [".zip", ".tar", ".gz"]}
 
+KERNEL_COPY_CHUNK_SIZE = 1024 * 1024 * 1024
+COPY_CHUNK_SIZE = 16 * 1024 * 1024
+LARGE_FILE_SIZE = 64 * 1024 * 1024
+MOVE_WORKERS = 4
+
+
+def copy_file_data(src_fd: int, dst_fd: int, size: int) -> None:
+    # Let the kernel copy the data when it can, fall back to a plain buffered copy.
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src_fd, dst_fd, min(KERNEL_COPY_CHUNK_SIZE, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP) or copied:
+                raise
+    # Other systems (macOS, FreeBSD) only sendfile to sockets.
+    if copied == 0 and size and sys.platform.startswith("linux"):
+        try:
+            while copied < size:
+                sent = os.sendfile(dst_fd, src_fd, copied, min(KERNEL_COPY_CHUNK_SIZE, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSOCK, errno.EOPNOTSUPP) or copied:
+                raise
+    if copied < size:
+        os.lseek(src_fd, copied, os.SEEK_SET)
+        os.lseek(dst_fd, copied, os.SEEK_SET)
+        while chunk := os.read(src_fd, COPY_CHUNK_SIZE):
+            os.write(dst_fd, chunk)
+
+
+def move_across_devices(src: Path, dst: Path) -> None:
+    size = src.stat().st_size
+    tmp = dst.with_name(f".{dst.name}.part")
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            copy_file_data(fsrc.fileno(), fdst.fileno(), size)
+        shutil.copystat(src, tmp)
+        if tmp.stat().st_size != size:
+            raise OSError(errno.EIO, "Copied size does not match source size", str(src))
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    src.unlink()
+
+
+def move(src: Path, dst: Path) -> None:
+    try:
+        src.replace(dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        move_across_devices(src, dst)
+
 
 def move_file(file: Path, root_dir: Path, categorie: str) -> None:
     target_dir = root_dir.joinpath(categorie)
-    if not target_dir.exists():
-        target_dir.mkdir()
-    file.replace(target_dir.joinpath(f"{normalize(file.stem)}{file.suffix}"))
+    target_dir.mkdir(exist_ok=True)
+    move(file, target_dir.joinpath(f"{normalize(file.stem)}{file.suffix}"))
 
 
 def delete_empty_folders(path: Path) -> None:
@@ -74,30 +135,226 @@ def unpack_archive(path: Path, sort: bool) -> None:
 
 
 def sort_folder(path: Path) -> None:
-    for item in path.glob("**/*"):
-        if item.is_file():
-            cat = get_categories(item)
-            move_file(item, path, cat)
+    # Large files may need a full copy if a category folder is on another device,
+    # so they are moved by a bounded pool while small files are moved right away.
+    with ThreadPoolExecutor(max_workers=MOVE_WORKERS) as pool:
+        large_moves = []
+        for item in path.glob("**/*"):
+            if item.is_file():
+                cat = get_categories(item)
+                if item.stat().st_size >= LARGE_FILE_SIZE:
+                    large_moves.append(pool.submit(move_file, item, path, cat))
+                else:
+                    move_file(item, path, cat)
+        for future in large_moves:
+            future.result()
+
+
+WATCH_INTERVAL = 1.0
+SETTLE_TIME = 2.0
+
+
+class Inotify:
+    """Minimal inotify binding. Reports directories whose entries changed."""
+
+    # Writes in progress are not watched: pending files are checked by FolderWatcher.move_settled.
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        # Filled by wait: directories that are no longer watched, and whether events were lost.
+        self.removed = set()
+        self.overflowed = False
+
+    def add(self, directory: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+
+    def wait(self, timeout) -> set:
+        changed = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                    offset += self.EVENT.size + length
+                    if mask & self.IN_Q_OVERFLOW:
+                        self.overflowed = True
+                    elif mask & self.IN_IGNORED:
+                        if wd in self.watches:
+                            self.removed.add(self.watches.pop(wd))
+                    elif wd in self.watches:
+                        changed.add(self.watches[wd])
+        except BlockingIOError:
+            pass
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Keeps a folder sorted by handling only new or changed files.
+
+    A scandir snapshot is taken once. After that only directories that changed are scanned again:
+    inotify reports them where available, otherwise their mtimes are compared on every poll.
+    A file is moved only after its size and mtime stayed the same for settle seconds,
+    so files that are still being written are left alone.
+    """
+
+    def __init__(self, path: Path, interval=WATCH_INTERVAL, settle=SETTLE_TIME, use_inotify=True):
+        self.root = path
+        self.interval = interval
+        self.settle = settle
+        self.skip = {str(path.joinpath(cat)) for cat in [*CATEGORIES, "Other"]}
+        self.dirs = {}
+        self.pending = {}
+        self.failed = {}
+        self.inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+
+    def add_dir(self, directory: str) -> None:
+        if directory in self.skip or directory in self.dirs:
+            return
+        if self.inotify:
+            self.inotify.add(directory)
+        self.scan_dir(directory)
+
+    def scan_dir(self, directory: str) -> None:
+        try:
+            self.dirs[directory] = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            self.dirs.pop(directory, None)
+            return
+
+        now = time.monotonic()
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                self.add_dir(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self.failed.get(entry.path) == signature:
+                    continue
+                if self.pending.get(entry.path, (None,))[0] != signature:
+                    self.pending[entry.path] = (signature, now)
+
+    def changed_dirs(self) -> set:
+        timeout = self.interval if self.pending or not self.inotify else None
+        if self.inotify:
+            changed = self.inotify.wait(timeout)
+            # A removed directory may be created again: its parent then adds it and watches it again.
+            for directory in self.inotify.removed:
+                self.dirs.pop(directory, None)
+            changed -= self.inotify.removed
+            self.inotify.removed.clear()
+            if self.inotify.overflowed:
+                # Events were dropped by the kernel: rescan the whole tree and renew the watches.
+                self.inotify.overflowed = False
+                self.dirs.clear()
+                self.add_dir(str(self.root))
+            return changed
+
+        time.sleep(timeout)
+        changed = set()
+        for directory, mtime in list(self.dirs.items()):
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    changed.add(directory)
+            except FileNotFoundError:
+                del self.dirs[directory]
+        return changed
+
+    def move_settled(self) -> None:
+        now = time.monotonic()
+        for file_path, (signature, since) in list(self.pending.items()):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                del self.pending[file_path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                self.pending[file_path] = (current, now)
+            elif now - since >= self.settle:
+                del self.pending[file_path]
+                file = Path(file_path)
+                category = get_categories(file)
+                try:
+                    move_file(file, self.root, category)
+                    print(f"/// {file} -> {category}")
+                except OSError as e:
+                    self.failed[file_path] = current
+                    print(f"/// {file} - not moved: {e}")
+
+    def run(self) -> None:
+        self.add_dir(str(self.root))
+        print(f"/// Watching {self.root} ({'inotify' if self.inotify else 'polling'}). Press Ctrl+C to stop.")
+        try:
+            while True:
+                for directory in self.changed_dirs():
+                    self.scan_dir(directory)
+                self.move_settled()
+        except KeyboardInterrupt:
+            print("/// Watching stopped.")
+        finally:
+            if self.inotify:
+                self.inotify.close()
 
 
 def main():
-    try:
-        path = Path(sys.argv[1])
-    except IndexError:
+    arg_parser = argparse.ArgumentParser(description="Sort files in a folder into categories")
+    arg_parser.add_argument("path", nargs="?")
+    arg_parser.add_argument("-y", "--yes", action="store_true",
+                            help="do not ask for confirmation, unpack and sort archives")
+    arg_parser.add_argument("-w", "--watch", action="store_true",
+                            help="keep running and sort new or changed files as they appear")
+    arg_parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                            help="in watch mode, seconds between checks (default: 1)")
+    args = arg_parser.parse_args()
+
+    if args.path is None:
         return "/// No path to folder"
+    path = Path(args.path)
     
     if not path.exists():
         return f"/// Folder {path} not found."
 
-    confirmation = input(f"/// Are you sure you want to sort the files in folder {path}? (Y - Yes, N - No) >>> ")
-    if confirmation.lower() != "y":
-        return "/// Sorting aborted."
+    if args.watch:
+        FolderWatcher(path, args.interval).run()
+        return
+
+    if not args.yes:
+        confirmation = input(f"/// Are you sure you want to sort the files in folder {path}? (Y - Yes, N - No) >>> ")
+        if confirmation.lower() != "y":
+            return "/// Sorting aborted."
 
     sort_folder(path)
     print(f"/// [{path}] \n/// Sorted")
     delete_empty_folders(path)
     print("/// Empty folders deleted")
-    wait_sort = True
+    wait_sort = not args.yes
+    if args.yes:
+        unpack_archive(path, True)
 
     while wait_sort:
         sort = input("/// Sort unpacked archives? (Y - Yes, N - No) >>> ")
@@ -0,0 +1,129 @@
+import calendar, phonenumbers
+from classes import normalize_phone
+from datetime import date
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+AGE_BUCKET = 10
+
+
+def country_code_table():
+    """Map every 3-digit phone prefix to its country calling code (0 if unknown).
+
+    Calling codes are prefix-free, so the first 1, 2 or 3 digits that form a known code are the code.
+    """
+    codes = set(phonenumbers.COUNTRY_CODE_TO_REGION_CODE)
+    table = np.zeros(1000, dtype=np.int16)
+    for prefix in range(100, 1000):
+        for code in (prefix // 100, prefix // 10, prefix):
+            if code in codes:
+                table[prefix] = code
+                break
+    return table
+
+
+class ContactStats:
+    """Aggregate reports over an AddressBook computed with NumPy.
+
+    Arrays are extracted from the records once and cached until the book's version changes.
+    """
+
+    def __init__(self, book):
+        if np is None:
+            raise ImportError("Contact statistics need NumPy. Install it with: pip install numpy")
+        self.book = book
+        self.version = None
+        self.codes = country_code_table()
+
+    def refresh(self):
+        if self.version == self.book.version:
+            return
+        records = list(self.book.data.values())
+
+        birthdays = [record.birthday.value.toordinal() for record in records if record.birthday]
+        self.birth_days = np.array(birthdays, dtype=np.int64) - UNIX_EPOCH_ORDINAL
+
+        owners, prefixes = [], []
+        for index, record in enumerate(records):
+            for phone in record.phones:
+                owners.append(index)
+                prefixes.append(normalize_phone(phone.value)[:3])
+        prefixes = np.array(prefixes, dtype="U3")
+        self.phone_owners = np.array(owners, dtype=np.int64)
+        self.phone_codes = self.codes[prefixes.astype(np.int64)] if len(prefixes) else np.zeros(0, dtype=np.int16)
+
+        domains = np.array([str(record.email).rpartition("@")[2].lower() for record in records if record.email])
+        self.domain_names, self.domain_ids = np.unique(domains, return_inverse=True)
+
+        self.contacts = len(records)
+        self.version = self.book.version
+
+    def birthdays_per_month(self) -> dict:
+        self.refresh()
+        months = self.birth_days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+        counts = np.bincount(months, minlength=12)
+        return {calendar.month_name[month + 1]: int(count) for month, count in enumerate(counts)}
+
+    def birthdays_per_weekday(self, year=None) -> dict:
+        """Weekday on which each birthday falls in the given year (default: this year)."""
+        self.refresh()
+        year = year or date.today().year
+        days = self.birth_days.astype("datetime64[D]")
+        month_starts = days.astype("datetime64[M]")
+        month_offsets = month_starts.astype(np.int64) % 12
+        day_offsets = (days - month_starts).astype(np.int64)
+        in_year = np.datetime64(f"{year}-01", "M") + month_offsets
+        # 29 February falls on 1 March in common years.
+        weekdays = (in_year.astype("datetime64[D]").astype(np.int64) + day_offsets + 3) % 7
+        counts = np.bincount(weekdays, minlength=7)
+        return {calendar.day_name[day]: int(count) for day, count in enumerate(counts)}
+
+    def age_distribution(self, today=None) -> dict:
+        self.refresh()
+        today = today or date.today()
+        days = self.birth_days.astype("datetime64[D]")
+        months = days.astype("datetime64[M]")
+        birth_years = months.astype(np.int64) // 12 + 1970
+        # (month, day) packed into one number, so birthdays compare without leap-year shifts.
+        month_days = months.astype(np.int64) % 12 * 32 + (days - months).astype(np.int64)
+        today_month_day = (today.month - 1) * 32 + today.day - 1
+        ages = today.year - birth_years - (month_days > today_month_day)
+        counts = np.bincount(np.clip(ages, 0, None) // AGE_BUCKET)
+        return {f"{bucket * AGE_BUCKET}-{bucket * AGE_BUCKET + AGE_BUCKET - 1}": int(count)
+                for bucket, count in enumerate(counts) if count}
+
+    def contacts_per_country_code(self) -> dict:
+        """Number of contacts with at least one phone under each calling code, most common first."""
+        self.refresh()
+        # Only contacts with several phones can repeat a code, so only they need the (slower) unique.
+        several = np.bincount(self.phone_owners, minlength=self.contacts)[self.phone_owners] > 1
+        pairs = np.unique(self.phone_owners[several] * 1000 + self.phone_codes[several])
+        counts = np.bincount(self.phone_codes[~several], minlength=1000) + np.bincount(pairs % 1000, minlength=1000)
+        codes = np.flatnonzero(counts)
+        codes = codes[np.argsort(-counts[codes], kind="stable")]
+        return {f"+{code}" if code else "unknown": int(counts[code]) for code in codes}
+
+    def email_domains(self, top=10) -> dict:
+        self.refresh()
+        counts = np.bincount(self.domain_ids, minlength=len(self.domain_names))
+        order = np.argsort(-counts, kind="stable")[:top]
+        return {str(self.domain_names[i]): int(counts[i]) for i in order}
+
+    def report(self) -> str:
+        sections = [
+            ("Birthdays per month", self.birthdays_per_month()),
+            ("Birthdays per weekday this year", self.birthdays_per_weekday()),
+            ("Age distribution", self.age_distribution()),
+            ("Contacts per country code", self.contacts_per_country_code()),
+            ("Top email domains", self.email_domains()),
+        ]
+        output = [f"/// Contacts: {self.contacts}"]
+        for title, values in sections:
+            output.append(f"/// {title}:")
+            output.extend(f"///   {key}: {value}" for key, value in values.items())
+            if not values:
+                output.append("///   N/A")
+        return "\n".join(output)
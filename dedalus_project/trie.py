@@ -0,0 +1,90 @@
+class TrieNode:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        self.children = {}
+        self.values = None
+
+
+class Trie:
+    """Maps string keys to sets of values and finds all values under a prefix.
+
+    Prefix lookups walk the prefix and then only the matching subtree,
+    so they take time proportional to the prefix length plus the number of matches.
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def add(self, key, value):
+        node = self.root
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+            node = child
+        if node.values is None:
+            node.values = set()
+        node.values.add(value)
+
+    def remove(self, key, value):
+        path = [self.root]
+        for char in key:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+
+        node = path[-1]
+        if not node.values:
+            return
+        node.values.discard(value)
+        if not node.values:
+            node.values = None
+
+        # Drop nodes that no longer lead to any value.
+        for char, parent in zip(reversed(key), reversed(path[:-1])):
+            child = parent.children[char]
+            if child.values or child.children:
+                break
+            del parent.children[char]
+
+    def _find_node(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key):
+        node = self._find_node(key)
+        return set(node.values) if node and node.values else set()
+
+    def items(self, prefix="", limit=None):
+        """Yield (key, value) pairs for all keys starting with prefix, in key order."""
+        node = self._find_node(prefix)
+        if node is None:
+            return
+        count = 0
+        stack = [(prefix, node)]
+        while stack:
+            key, node = stack.pop()
+            if node.values:
+                for value in node.values:
+                    yield key, value
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+            stack.extend((key + char, child) for char, child in sorted(node.children.items(), reverse=True))
+
+    def values(self, prefix="", limit=None):
+        seen = set()
+        for _, value in self.items(prefix, limit):
+            if value not in seen:
+                seen.add(value)
+                yield value
+
+    def __contains__(self, key):
+        node = self._find_node(key)
+        return bool(node and node.values)
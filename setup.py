@@ -11,5 +11,6 @@ setup(
     packages=find_namespace_packages(),
     install_requires=['requests',
                       'phonenumbers'],
+    extras_require={'stats': ['numpy']},
     entry_points=({'console_scripts': ['dedalusrun = dedalus_project.bot:main']})
 )